@@ -0,0 +1,211 @@
+import io
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import tempfile
+import subprocess
+import contextlib
+import importlib.util
+import zipfile
+import posixpath
+from urllib.parse import unquote
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Each mode runs in a fresh process so its peak RSS is measured on its own
+MODES = {
+    'process_directory': None,
+    'main': [],
+    'main-pipeline': ['--pipeline'],
+    'main-output-dir': ['--output-dir'],
+}
+
+def load_script(name):
+    # The scripts have dashes in their names, so load them by path
+    path = os.path.join(SCRIPT_DIR, name)
+    module_name = os.path.splitext(name)[0].replace('-', '_')
+    spec = importlib.util.spec_from_file_location(module_name, path)
+    module = importlib.util.module_from_spec(spec)
+    # Registered so the pipeline's worker processes can pickle its functions
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
+
+def peak_rss_bytes(who=resource.RUSAGE_SELF):
+    # ru_maxrss is reported in kilobytes on Linux and bytes on macOS. For
+    # RUSAGE_CHILDREN it is the peak of the largest child that has exited.
+    peak = resource.getrusage(who).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+def link_targets(cleaner, page_name, data):
+    # Resolve the relative links of a page to paths inside the export
+    targets = []
+    for _, link in cleaner.LINK_PATTERN.findall(data.decode('utf-8')):
+        if '://' in link or link.startswith(('#', '/', 'mailto:')):
+            continue
+        target = unquote(link.partition('#')[0])
+        targets.append(posixpath.normpath(posixpath.join(posixpath.dirname(page_name), target)))
+    return targets
+
+def check_links(cleaner, zip_file_path, read_cleaned):
+    # Every link in the cleaned output must point at the cleaned name of the
+    # member it pointed at in the export. Returns how many links don't,
+    # counting every link of a page that is missing from the output.
+    bad_links = 0
+    with zipfile.ZipFile(zip_file_path, 'r') as zip_ref:
+        new_names, _ = cleaner.build_member_mapping(zip_ref.namelist())
+        for name in zip_ref.namelist():
+            if os.path.splitext(name)[1].lower() not in cleaner.TEXT_EXTENSIONS:
+                continue
+            expected = [new_names.get(target, target)
+                        for target in link_targets(cleaner, name, zip_ref.read(name))]
+            data = read_cleaned(new_names[name])
+            actual = [] if data is None else link_targets(cleaner, new_names[name], data)
+            bad_links += sum(1 for old, new in zip(expected, actual) if old != new)
+            bad_links += abs(len(expected) - len(actual))
+    return bad_links
+
+def directory_reader(directory):
+    def read_cleaned(name):
+        path = os.path.join(directory, *name.split('/'))
+        if not os.path.isfile(path):
+            return None
+        with open(path, 'rb') as file:
+            return file.read()
+    return read_cleaned
+
+def run_one(mode, zip_file_path):
+    # Runs inside the child process and prints its measurements as JSON
+    cleaner = load_script('notion-export-cleaner.py')
+    work_dir = os.path.dirname(zip_file_path)
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        if MODES[mode] is None:
+            with tempfile.TemporaryDirectory(dir=work_dir) as temp_dir:
+                with zipfile.ZipFile(zip_file_path, 'r') as zip_ref:
+                    zip_ref.extractall(temp_dir)
+                cleaner.process_directory(temp_dir)
+                wall_time = time.perf_counter() - start
+                bad_links = check_links(cleaner, zip_file_path, directory_reader(temp_dir))
+        else:
+            extra_args = list(MODES[mode])
+            output_dir = os.path.join(work_dir, 'cleaned')
+            if extra_args == ['--output-dir']:
+                extra_args.append(output_dir)
+            sys.argv = ['notion-export-cleaner.py', zip_file_path] + extra_args
+            cleaner.main()
+            wall_time = time.perf_counter() - start
+
+            if extra_args[0:1] == ['--output-dir']:
+                bad_links = check_links(cleaner, zip_file_path, directory_reader(output_dir))
+            else:
+                output_zip_path = os.path.splitext(zip_file_path)[0] + '_cleaned.zip'
+                with zipfile.ZipFile(output_zip_path, 'r') as output_zip:
+                    names = set(output_zip.namelist())
+                    bad_links = check_links(cleaner, zip_file_path,
+                                            lambda name: output_zip.read(name) if name in names else None)
+
+    # --pipeline rewrites in pool workers, which have all exited by now
+    print(json.dumps({
+        'wall_time': wall_time,
+        'peak_rss': peak_rss_bytes(),
+        'peak_rss_workers': peak_rss_bytes(resource.RUSAGE_CHILDREN),
+        'bad_links': bad_links,
+    }))
+
+def measure(mode, zip_file_path, timeout):
+    # Returns None when the run takes longer than timeout seconds
+    try:
+        result = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--run-one', mode, zip_file_path],
+            check=True, capture_output=True, text=True, timeout=timeout,
+        )
+    except subprocess.TimeoutExpired:
+        return None
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the Notion export cleaner on synthetic exports of increasing size.")
+    # Link rewriting grows with files x renamed names, so 10k+ pages take hours
+    parser.add_argument('--pages', type=int, nargs='+', default=[100, 300, 1000],
+                        help="page counts to benchmark (default: 100 300 1000)")
+    parser.add_argument('--modes', nargs='+', choices=list(MODES), default=list(MODES),
+                        help="cleaner flows to run (default: all)")
+    parser.add_argument('--depth', type=int, default=4)
+    parser.add_argument('--links-per-page', type=int, default=5)
+    parser.add_argument('--attachments-per-page', type=int, default=1)
+    parser.add_argument('--attachment-size', type=int, default=16 * 1024)
+    parser.add_argument('--encoded-ratio', type=float, default=0.2)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--timeout', type=float, default=600,
+                        help="seconds before a single run is stopped and recorded as timed out (default: 600)")
+    parser.add_argument('--json', help="also write the results to this JSON file")
+    parser.add_argument('--run-one', nargs=2, metavar=('MODE', 'ZIP'), help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    if args.run_one:
+        run_one(*args.run_one)
+        return
+
+    generator = load_script('notion-export-generator.py')
+    results = []
+
+    print(f"{'pages':>8} {'mode':<18} {'wall (s)':>9} {'peak RSS':>10} {'worker RSS':>11} {'pages/s':>10} {'MB/s':>8} {'bad links':>10}")
+    for pages in args.pages:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            zip_file_path = os.path.join(temp_dir, 'export.zip')
+            generator.generate_export(
+                zip_file_path,
+                pages=pages,
+                depth=args.depth,
+                links_per_page=args.links_per_page,
+                attachments_per_page=args.attachments_per_page,
+                attachment_size=args.attachment_size,
+                encoded_ratio=args.encoded_ratio,
+                seed=args.seed,
+            )
+            zip_size = os.path.getsize(zip_file_path)
+
+            for mode in args.modes:
+                measurement = measure(mode, zip_file_path, args.timeout)
+                if measurement is None:
+                    results.append({'pages': pages, 'mode': mode, 'zip_bytes': zip_size,
+                                    'status': 'timed out', 'timeout': args.timeout})
+                    print(f"{pages:>8} {mode:<18} timed out after {args.timeout:g}s")
+                    continue
+                wall_time = measurement['wall_time']
+                result = {
+                    'status': 'ok',
+                    'pages': pages,
+                    'mode': mode,
+                    'zip_bytes': zip_size,
+                    'wall_time': wall_time,
+                    'peak_rss': measurement['peak_rss'],
+                    # Peak of the largest worker process, for modes that use them
+                    'peak_rss_workers': measurement['peak_rss_workers'],
+                    'pages_per_second': pages / wall_time,
+                    'bytes_per_second': zip_size / wall_time,
+                    'bad_links': measurement['bad_links'],
+                }
+                results.append(result)
+                worker_rss = (f"{result['peak_rss_workers'] / (1024 * 1024):>9.1f}MB"
+                              if result['peak_rss_workers'] else f"{'-':>11}")
+                print(f"{pages:>8} {mode:<18} {wall_time:>9.2f} "
+                      f"{result['peak_rss'] / (1024 * 1024):>8.1f}MB {worker_rss} "
+                      f"{result['pages_per_second']:>10.0f} "
+                      f"{result['bytes_per_second'] / (1024 * 1024):>8.1f} "
+                      f"{result['bad_links']:>10}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as file:
+            json.dump(results, file, indent=2)
+
+if __name__ == "__main__":
+    main()
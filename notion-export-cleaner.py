@@ -1,15 +1,52 @@
 import os
 import re
+import mmap
 import sys
+import json
+import time
+import zlib
+import queue
 import shutil
+import signal
+import hashlib
+import argparse
+import functools
 import tempfile
+import threading
 import zipfile
+import multiprocessing
+import multiprocessing.pool
+import concurrent.futures
 from urllib.parse import unquote, quote
 
+# File extensions whose contents contain links that need updating
+TEXT_EXTENSIONS = {'.md', '.html', '.txt'}
+
+# Matches the target of an HTML src/href attribute or a Markdown link. An
+# attribute runs to its closing quote; a Markdown target runs to its closing
+# parenthesis but may hold balanced ones, as in Notion's "Untitled (1).png".
+LINK_PATTERN = re.compile(r'((?:src|href)=["\']|\]\()((?<=["\'])[^"\']+|(?<=\()(?:[^"\'()]|\([^"\'()]*\))+)')
+
+# Characters that may come right before or after a link target in a page
+LINK_BOUNDARY_BEFORE = set(' \t\r\n"\'(<=')
+LINK_BOUNDARY_AFTER = set(' \t\r\n"\')>#?')
+
+# Records what an --output-dir run wrote, so the next run can reuse unchanged
+# files. It is kept next to the output directory, not in the cleaned tree.
+MANIFEST_SUFFIX = '.notion-cleaner-manifest.json'
+
+# A Notion ID at the end of a file or folder name, before any extension
+NOTION_ID_PATTERN = re.compile(r'^(.*?)(\s[0-9a-f]{32})(\..+)?$')
+
+# Raw-bytes signature of a Notion ID, used to skip files with nothing to
+# rewrite. Every renamed name carries an ID, so any link to one contains it.
+NOTION_ID_BYTES = re.compile(rb'[0-9a-f]{32}')
+
+@functools.lru_cache(maxsize=65536)
 def strip_notion_id(name):
-    # Remove Notion IDs from filenames and folder names
-    pattern = r'^(.*?)(\s[0-9a-f]{32})(\..+)?$'
-    match = re.match(pattern, name)
+    # Remove Notion IDs from filenames and folder names. Cached because the
+    # same folder names repeat across every member path of an archive.
+    match = NOTION_ID_PATTERN.match(name)
     if match:
         name_without_id = match.group(1)
         extension = match.group(3) if match.group(3) else ''
@@ -19,75 +56,921 @@ def strip_notion_id(name):
 def path_depth(path):
     return path.count(os.sep)
 
-def update_links_in_file(file_path, path_mapping):
-    # Update links in files to reflect new filenames
-    with open(file_path, 'r', encoding='utf-8') as file:
-        content = file.read()
-
-    updated = False
+def compile_link_patterns(path_mapping):
+    # Compile the link patterns for a path_mapping once, so they are reused
+    # for every file instead of going through re's small pattern cache
+    replacements = {}
 
     for old_path, new_path in path_mapping.items():
         old_name = os.path.basename(old_path)
         new_name = os.path.basename(new_path)
 
-        # Prepare patterns for different link formats
-        patterns = [
-            re.escape(quote(old_name)),
-            re.escape(old_name),
-        ]
+        # Prepare patterns for different link formats. Encoded links get the
+        # new name encoded too, or a '#' or '%' in it would break the link.
+        replacements[quote(old_name)] = quote(new_name)
+        replacements[old_name] = new_name
+
+    # Longest names first: a folder's old name is a prefix of its page's old
+    # name, so "Foo <id>" must not be rewritten inside "Foo <id>.html" when
+    # the two were given different suffixes
+    return [(re.compile(re.escape(name)), replacements[name])
+            for name in sorted(replacements, key=len, reverse=True)]
+
+def rewrite_links(content, link_patterns):
+    # Replace old filenames in content with the new filenames.
+    # Returns the new content and whether anything changed.
+    updated = False
+
+    for pattern, new_name in link_patterns:
+        # Replace all occurrences of the old filename with the new filename
+        if pattern.search(content):
+            content = pattern.sub(new_name, content)
+            updated = True
+
+    return content, updated
+
+def file_matches_prefilter(file_path):
+    # Scan the raw bytes through a memory map so files without any
+    # reference are never decoded
+    with open(file_path, 'rb') as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            return False
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            return NOTION_ID_BYTES.search(mapped) is not None
+
+def update_links_in_file(file_path, link_patterns):
+    # Update links in files to reflect new filenames
+    with open(file_path, 'r', encoding='utf-8') as file:
+        content = file.read()
 
-        for pattern in patterns:
-            # Replace all occurrences of the old filename with the new filename
-            if re.search(pattern, content):
-                content = re.sub(pattern, new_name, content)
-                updated = True
+    content, updated = rewrite_links(content, link_patterns)
 
     if updated:
         with open(file_path, 'w', encoding='utf-8') as file:
             file.write(content)
 
 def process_directory(root_directory):
-    path_mapping = {}  # Map old full paths to new full paths
+    # Returns the number and total size of the text files skipped by the
+    # pre-filter, as skipped_files and skipped_bytes
+    stats = {'skipped_files': 0, 'skipped_bytes': 0}
 
-    # Step 1: Build mapping of old and new paths
-    for root, dirs, files in os.walk(root_directory, topdown=False):
-        # Process files
-        for name in files:
-            old_path = os.path.join(root, name)
-            new_name = strip_notion_id(name)
-            if new_name != name:
-                new_path = os.path.join(root, new_name)
-                path_mapping[old_path] = new_path
-        # Process directories
-        for name in dirs:
-            old_path = os.path.join(root, name)
-            new_name = strip_notion_id(name)
-            if new_name != name:
-                new_path = os.path.join(root, new_name)
-                path_mapping[old_path] = new_path
-
-    # Step 2: Sort and rename files and directories
-    # Sorting ensures we rename the deepest paths first to avoid conflicts
-    for old_path, new_path in sorted(path_mapping.items(), key=lambda x: path_depth(x[0]), reverse=True):
+    # Step 1: Name the tree the same way the zip flows do, so names that
+    # collide once IDs are stripped get the same " (2)"-style suffixes
+    member_names = []
+    for root, dirs, files in os.walk(root_directory):
+        relative_root = os.path.relpath(root, root_directory)
+        prefix = '' if relative_root == '.' else relative_root.replace(os.sep, '/') + '/'
+        member_names.extend(prefix + name + '/' for name in dirs)
+        member_names.extend(prefix + name for name in files)
+    new_names, path_mapping = build_member_mapping(member_names)
+
+    # Step 2: Rename the deepest paths first, so each rename only changes the
+    # last component of a path whose parents still have their old names
+    for member_name in sorted(new_names, key=lambda name: name.rstrip('/').count('/'), reverse=True):
+        old_parts = member_name.rstrip('/').split('/')
+        new_part = new_names[member_name].rstrip('/').split('/')[-1]
+        if new_part == old_parts[-1]:
+            continue
+        old_path = os.path.join(root_directory, *old_parts)
+        new_path = os.path.join(root_directory, *old_parts[:-1], new_part)
         try:
             os.rename(old_path, new_path)
         except OSError as e:
             print(f"Error renaming {old_path} to {new_path}: {e}")
 
     # Step 3: Update links in all text-based files
-    # Define file extensions to process
-    text_extensions = {'.md', '.html', '.txt'}
+    link_patterns = compile_link_patterns(path_mapping)
 
     for root, _, files in os.walk(root_directory):
         for name in files:
             _, ext = os.path.splitext(name)
-            if ext.lower() in text_extensions:
+            if ext.lower() in TEXT_EXTENSIONS:
                 file_path = os.path.join(root, name)
-                update_links_in_file(file_path, path_mapping)
+                if not file_matches_prefilter(file_path):
+                    stats['skipped_files'] += 1
+                    stats['skipped_bytes'] += os.path.getsize(file_path)
+                    continue
+                update_links_in_file(file_path, link_patterns)
+
+    return stats
+
+def unique_name(new_parent, name, taken):
+    # Add " (2)", " (3)", ... before the extension until the path is free
+    if new_parent + (name,) not in taken:
+        return name
+    stem, ext = os.path.splitext(name)
+    number = 2
+    while new_parent + (f"{stem} ({number}){ext}",) in taken:
+        number += 1
+    return f"{stem} ({number}){ext}"
+
+def build_member_mapping(member_names):
+    # Map zip member names to their names without Notion IDs, plus a
+    # path_mapping of every renamed file and folder for rewriting links.
+    # When stripping IDs would give two files or folders the same path, the
+    # later ones get a " (2)"-style suffix so nothing is overwritten.
+    prefixes = set()
+    for member_name in member_names:
+        parts = member_name.rstrip('/').split('/')
+        for depth in range(len(parts)):
+            prefixes.add(tuple(parts[:depth + 1]))
+
+    new_prefixes = {(): ()}
+    taken = set()
+    path_mapping = {}
+
+    # Name one level at a time, so parents are settled before their children.
+    # Names without an ID go first at each level so they always keep their name.
+    for prefix in sorted(prefixes, key=lambda p: (len(p), strip_notion_id(p[-1]) != p[-1], p)):
+        part = prefix[-1]
+        new_parent = new_prefixes[prefix[:-1]]
+        new_part = strip_notion_id(part)
+        if new_part != part:
+            new_part = unique_name(new_parent, new_part, taken)
+            # Record each renamed path component, like process_directory does
+            path_mapping['/'.join(prefix)] = '/'.join(new_parent + (new_part,))
+        new_prefixes[prefix] = new_parent + (new_part,)
+        taken.add(new_prefixes[prefix])
+
+    new_names = {}
+    for member_name in member_names:
+        new_name = '/'.join(new_prefixes[tuple(member_name.rstrip('/').split('/'))])
+        new_names[member_name] = new_name + '/' if member_name.endswith('/') else new_name
+
+    return new_names, path_mapping
+
+def clean_member(new_name, data, link_patterns):
+    # Rewrite links in a text member's bytes. Returns the new bytes and
+    # whether the pre-filter let the member skip rewriting.
+    _, ext = os.path.splitext(new_name)
+    if ext.lower() not in TEXT_EXTENSIONS:
+        return data, False
+    if not NOTION_ID_BYTES.search(data):
+        return data, True
+    content, updated = rewrite_links(data.decode('utf-8'), link_patterns)
+    return (content.encode('utf-8') if updated else data), False
+
+def write_member(output_zip, info, new_name, data):
+    new_info = zipfile.ZipInfo(new_name, date_time=info.date_time)
+    new_info.external_attr = info.external_attr
+    new_info.compress_type = zipfile.ZIP_DEFLATED
+    output_zip.writestr(new_info, data)
+
+def clean_zip_file(zip_file_path, output_zip_path):
+    # Clean a zip member by member in the current thread, without extracting it.
+    # Returns the number and total size of the text members skipped by the pre-filter.
+    stats = {'skipped_files': 0, 'skipped_bytes': 0}
+
+    with zipfile.ZipFile(zip_file_path, 'r') as zip_ref, \
+            zipfile.ZipFile(output_zip_path, 'w', zipfile.ZIP_DEFLATED) as output_zip:
+        new_names, path_mapping = build_member_mapping(zip_ref.namelist())
+        link_patterns = compile_link_patterns(path_mapping)
+
+        for info in zip_ref.infolist():
+            new_name = new_names[info.filename]
+            data = b'' if info.is_dir() else zip_ref.read(info)
+            data, was_skipped = clean_member(new_name, data, link_patterns)
+            if was_skipped:
+                stats['skipped_files'] += 1
+                stats['skipped_bytes'] += len(data)
+            write_member(output_zip, info, new_name, data)
+
+    return stats
+
+# Link patterns of a pipeline rewrite worker process, set by init_rewrite_worker
+rewrite_worker_patterns = []
+
+def init_rewrite_worker(path_mapping):
+    global rewrite_worker_patterns
+    # Ctrl+C is handled by the parent, which tears the pool down
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    rewrite_worker_patterns = compile_link_patterns(path_mapping)
+
+def rewrite_text_job(data):
+    # Runs in a rewrite worker. Returns the new bytes and the CPU time spent.
+    start = time.process_time()
+    content, updated = rewrite_links(data.decode('utf-8'), rewrite_worker_patterns)
+    if updated:
+        data = content.encode('utf-8')
+    return data, time.process_time() - start
+
+def clean_zip_pipelined(zip_file_path, output_zip_path, workers=None, buffer_size=64 * 1024 * 1024):
+    # Clean a zip without extracting it: a reader thread inflates members, a
+    # pool of worker processes rewrites links and a writer thread deflates into
+    # the output zip, all at the same time. At most buffer_size bytes of members
+    # are held between the reader and the writer; attachments bigger than that
+    # are streamed straight from the input by the writer instead. The output is
+    # written under a temporary name and only renamed into place on success.
+    # Returns the CPU utilization of each stage so the worker count can be
+    # tuned, and how many text members were skipped by the pre-filter.
+    workers = workers or os.cpu_count() or 1
+    if workers < 1:
+        raise ValueError("workers must be at least 1")
+
+    write_queue = queue.Queue()
+    stop = threading.Event()
+    errors = []
+    cpu = {'read': 0.0, 'rewrite': 0.0, 'write': 0.0}
+    skipped = {'skipped_files': 0, 'skipped_bytes': 0}
+    buffer_state = {'used': 0}
+    buffer_changed = threading.Condition()
+    done = object()
+
+    def reserve(size):
+        # Wait for room in the buffer. A member bigger than the whole buffer
+        # waits until the buffer is empty, so it is the only one held.
+        with buffer_changed:
+            while (not stop.is_set() and buffer_state['used']
+                   and buffer_state['used'] + size > buffer_size):
+                buffer_changed.wait(0.1)
+            buffer_state['used'] += size
+        return not stop.is_set()
+
+    def release(size):
+        with buffer_changed:
+            buffer_state['used'] -= size
+            buffer_changed.notify_all()
+
+    def get(q):
+        while not stop.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return done
+
+    def run_stage(target, *args):
+        try:
+            target(*args)
+        except Exception as e:
+            errors.append(e)
+            stop.set()
+
+    def read_members(zip_ref, new_names, pool):
+        # CPU time, not wall time, so waiting on the GIL or the buffer isn't
+        # counted as busy
+        start = time.thread_time()
+        try:
+            for info in zip_ref.infolist():
+                new_name = new_names[info.filename]
+                _, ext = os.path.splitext(new_name)
+                is_text = ext.lower() in TEXT_EXTENSIONS
+                if info.is_dir() or (not is_text and info.file_size > buffer_size):
+                    write_queue.put((info, new_name, None, 0))
+                    continue
+
+                if not reserve(info.file_size):
+                    return
+                data = zip_ref.read(info)
+                if is_text:
+                    if NOTION_ID_BYTES.search(data):
+                        data = pool.apply_async(rewrite_text_job, (data,))
+                    else:
+                        skipped['skipped_files'] += 1
+                        skipped['skipped_bytes'] += len(data)
+                write_queue.put((info, new_name, data, info.file_size))
+            write_queue.put(done)
+        finally:
+            cpu['read'] = time.thread_time() - start
+
+    def write_members(zip_ref, output_zip):
+        start = time.thread_time()
+        try:
+            while True:
+                item = get(write_queue)
+                if item is done:
+                    return
+                info, new_name, data, size = item
+                if isinstance(data, multiprocessing.pool.AsyncResult):
+                    data, rewrite_seconds = data.get()
+                    cpu['rewrite'] += rewrite_seconds
+
+                if data is None and not info.is_dir():
+                    # Too big to buffer, so copy it across in chunks
+                    new_info = zipfile.ZipInfo(new_name, date_time=info.date_time)
+                    new_info.external_attr = info.external_attr
+                    new_info.compress_type = zipfile.ZIP_DEFLATED
+                    new_info.file_size = info.file_size
+                    with zip_ref.open(info) as src, \
+                            output_zip.open(new_info, 'w', force_zip64=info.file_size > zipfile.ZIP64_LIMIT) as dst:
+                        shutil.copyfileobj(src, dst, 1024 * 1024)
+                else:
+                    write_member(output_zip, info, new_name, data or b'')
+                release(size)
+        finally:
+            cpu['write'] = time.thread_time() - start
+
+    temp_path = os.path.join(os.path.dirname(os.path.abspath(output_zip_path)),
+                             f".{os.path.basename(output_zip_path)}.{os.getpid()}.tmp")
+    wall_start = time.perf_counter()
+    try:
+        with zipfile.ZipFile(zip_file_path, 'r') as zip_ref:
+            new_names, path_mapping = build_member_mapping(zip_ref.namelist())
+
+            # The pool forks its workers here, before any pipeline thread starts
+            with multiprocessing.Pool(workers, initializer=init_rewrite_worker, initargs=(path_mapping,)) as pool, \
+                    zipfile.ZipFile(temp_path, 'w', zipfile.ZIP_DEFLATED) as output_zip:
+                threads = [
+                    threading.Thread(target=run_stage, args=(read_members, zip_ref, new_names, pool)),
+                    threading.Thread(target=run_stage, args=(write_members, zip_ref, output_zip)),
+                ]
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+
+        if errors:
+            raise errors[0]
+        os.replace(temp_path, output_zip_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    wall_time = time.perf_counter() - wall_start
+
+    stage_capacity = {'read': 1, 'rewrite': workers, 'write': 1}
+    return {
+        'wall_time': wall_time,
+        'utilization': {
+            stage: cpu[stage] / (wall_time * stage_capacity[stage]) if wall_time else 0.0
+            for stage in cpu
+        },
+        **skipped,
+    }
+
+def manifest_path_for(directory):
+    directory = os.path.abspath(directory)
+    return os.path.join(os.path.dirname(directory), '.' + os.path.basename(directory) + MANIFEST_SUFFIX)
+
+def read_manifest(directory):
+    manifest_path = manifest_path_for(directory)
+    if not os.path.isfile(manifest_path):
+        return None
+    with open(manifest_path, 'r', encoding='utf-8') as file:
+        return json.load(file)
+
+def link_or_copy(src, dst):
+    # Share the existing file when possible; otherwise let the kernel copy it.
+    # dst must not exist yet; it is never opened in place, because it could be
+    # a hardlink to src. Returns 'linked' or 'copied'.
+    try:
+        os.link(src, dst)
+        return 'linked'
+    except OSError:
+        pass
+
+    if hasattr(os, 'copy_file_range'):
+        try:
+            with open(src, 'rb') as src_file, open(dst, 'xb') as dst_file:
+                remaining = os.fstat(src_file.fileno()).st_size
+                while remaining > 0:
+                    copied = os.copy_file_range(src_file.fileno(), dst_file.fileno(), remaining)
+                    if copied == 0:
+                        break
+                    remaining -= copied
+            if remaining == 0:
+                shutil.copystat(src, dst)
+                return 'copied'
+        except OSError:
+            pass
+
+    if os.path.lexists(dst):
+        os.remove(dst)
+    shutil.copy2(src, dst)
+    return 'copied'
+
+def clean_zip_to_directory(zip_file_path, output_dir, cache_dir=None):
+    # Write the cleaned tree straight into output_dir. Files that are unchanged
+    # since the run that produced cache_dir (by default the previous contents of
+    # output_dir) are hardlinked or copied from it instead of being written.
+    # The manifest describing the tree is kept beside output_dir, as
+    # .<name>.notion-cleaner-manifest.json, so consumers only see cleaned files.
+    # Returns counts of written, linked and copied files plus pre-filter stats.
+    output_dir = os.path.abspath(output_dir)
+    previous_manifest = read_manifest(output_dir) if os.path.isdir(output_dir) else None
+
+    if os.path.isdir(output_dir) and os.listdir(output_dir) and previous_manifest is None:
+        raise ValueError(f"{output_dir} is not empty and was not created by this tool")
+
+    if cache_dir is None and previous_manifest is not None:
+        cache_dir = output_dir
+    cache_manifest = (read_manifest(cache_dir) if cache_dir else None) or {}
+
+    stats = {'written': 0, 'linked': 0, 'copied': 0, 'skipped_files': 0, 'skipped_bytes': 0}
+    manifest = {}
+
+    # Build the new tree next to the output so it can be swapped in by rename
+    parent_dir = os.path.dirname(output_dir)
+    os.makedirs(parent_dir, exist_ok=True)
+    staging_dir = tempfile.mkdtemp(prefix='.' + os.path.basename(output_dir) + '.', dir=parent_dir)
+    # mkdtemp creates a private directory; give it the usual permissions
+    umask = os.umask(0)
+    os.umask(umask)
+    os.chmod(staging_dir, 0o777 & ~umask)
+
+    try:
+        with zipfile.ZipFile(zip_file_path, 'r') as zip_ref:
+            new_names, path_mapping = build_member_mapping(zip_ref.namelist())
+            link_patterns = compile_link_patterns(path_mapping)
+
+            for info in zip_ref.infolist():
+                new_name = new_names[info.filename].rstrip('/')
+                target_path = os.path.normpath(os.path.join(staging_dir, new_name))
+                # Never write outside the output tree
+                if not target_path.startswith(staging_dir + os.sep):
+                    continue
+                if info.is_dir():
+                    os.makedirs(target_path, exist_ok=True)
+                    continue
+                os.makedirs(os.path.dirname(target_path), exist_ok=True)
+
+                _, ext = os.path.splitext(new_name)
+                if ext.lower() in TEXT_EXTENSIONS:
+                    data, was_skipped = clean_member(new_name, zip_ref.read(info), link_patterns)
+                    if was_skipped:
+                        stats['skipped_files'] += 1
+                        stats['skipped_bytes'] += len(data)
+                    entry = {'size': len(data), 'crc': zlib.crc32(data)}
+                else:
+                    # Attachments are copied verbatim, so the zip's own CRC identifies them
+                    data = None
+                    entry = {'size': info.file_size, 'crc': info.CRC}
+
+                manifest[new_name] = entry
+                # Anything already at the target may be a hardlink into the
+                # cache, so replace it rather than writing through it
+                if os.path.lexists(target_path):
+                    os.remove(target_path)
+
+                cached_path = os.path.join(cache_dir, new_name) if cache_dir else None
+                if (cache_manifest.get(new_name) == entry
+                        and os.path.isfile(cached_path)
+                        and os.path.getsize(cached_path) == entry['size']):
+                    stats[link_or_copy(cached_path, target_path)] += 1
+                    continue
+
+                if data is None:
+                    with zip_ref.open(info) as src, open(target_path, 'xb') as dst:
+                        shutil.copyfileobj(src, dst, 1024 * 1024)
+                else:
+                    with open(target_path, 'xb') as dst:
+                        dst.write(data)
+                stats['written'] += 1
+
+        # Drop the old manifest first: if the swap is interrupted, the next run
+        # refuses to reuse a tree it can no longer vouch for
+        manifest_path = manifest_path_for(output_dir)
+        if os.path.exists(manifest_path):
+            os.remove(manifest_path)
+
+        # Swap the new tree in with two renames. This is not atomic: output_dir
+        # is briefly missing between them, but never holds a partial tree.
+        if os.path.isdir(output_dir):
+            old_dir = staging_dir + '.old'
+            os.rename(output_dir, old_dir)
+            os.rename(staging_dir, output_dir)
+            shutil.rmtree(old_dir, ignore_errors=True)
+        else:
+            os.rename(staging_dir, output_dir)
+    except BaseException:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        raise
+
+    with open(manifest_path + '.tmp', 'w', encoding='utf-8') as file:
+        json.dump(manifest, file)
+    os.replace(manifest_path + '.tmp', manifest_path)
+
+    return stats
+
+def init_daemon_worker():
+    # Leave Ctrl+C to the daemon. SIGTERM keeps its default action, so a
+    # worker sent it with the daemon's process group simply exits and the
+    # executor fails its jobs instead of waiting on them.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    # Warm up the compiled patterns before the first archive arrives
+    strip_notion_id('Warm up ' + '0' * 32 + '.html')
+
+def clean_archive_job(zip_file_path, output_zip_path):
+    # Runs in a daemon pool worker. The zip is written under a temporary name
+    # in the output directory and renamed into place, so it appears atomically.
+    started_at = time.time()
+    temp_path = os.path.join(os.path.dirname(output_zip_path),
+                             f".{os.path.basename(output_zip_path)}.{os.getpid()}.tmp")
+    try:
+        stats = clean_zip_file(zip_file_path, temp_path)
+        os.replace(temp_path, output_zip_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+    stats['started_at'] = started_at
+    stats['finished_at'] = time.time()
+    stats['bytes_in'] = os.path.getsize(zip_file_path)
+    stats['bytes_out'] = os.path.getsize(output_zip_path)
+    return stats
+
+def remove_partial_outputs(output_dir):
+    # Remove temporary zips left behind by daemon workers that were killed
+    # mid-archive. Only call this while no worker is running.
+    for name in os.listdir(output_dir):
+        if name.startswith('.') and name.endswith('.tmp') and '_cleaned.zip.' in name:
+            try:
+                os.remove(os.path.join(output_dir, name))
+            except OSError as e:
+                print(f"Error removing {name}: {e}")
+
+def watch_directory(watch_dir, output_dir, workers=None, poll_interval=2.0, settle_time=5.0,
+                    status_file=None, status_interval=10.0):
+    # Clean every .zip that lands in watch_dir into output_dir until stopped
+    # with Ctrl+C or SIGTERM. A file is picked up once its size and mtime have
+    # not changed for settle_time seconds. Archives are cleaned by a pool of
+    # worker processes that is kept for the whole run and replaced if a worker
+    # is killed, and throughput and queue latency are written to status_file
+    # every status_interval seconds.
+    workers = workers or os.cpu_count() or 1
+    status_file = status_file or os.path.join(output_dir, 'status.json')
+    os.makedirs(output_dir, exist_ok=True)
+    remove_partial_outputs(output_dir)
+
+    stop = threading.Event()
+    metrics_lock = threading.Lock()
+    metrics = {
+        'started_at': time.time(),
+        'submitted': 0,
+        'processed': 0,
+        'failed': 0,
+        'bytes_in': 0,
+        'bytes_out': 0,
+        'skipped_files': 0,
+        'queue_latency_total': 0.0,
+        'queue_latency_max': 0.0,
+        'processing_time_total': 0.0,
+        'last_error': None,
+    }
+    candidates = {}  # Map paths to (size, mtime_ns, time that state was first seen)
+    submitted = set()  # (path, size, mtime_ns) of every archive already handled
+
+    def on_finished(zip_file_path, queued_at):
+        def callback(future):
+            try:
+                stats = future.result()
+            except Exception as error:
+                if isinstance(error, concurrent.futures.process.BrokenProcessPool):
+                    error = "worker process was killed"
+                with metrics_lock:
+                    metrics['failed'] += 1
+                    metrics['last_error'] = f"{os.path.basename(zip_file_path)}: {error}"
+                print(f"Error cleaning {zip_file_path}: {error}")
+                return
+
+            latency = stats['started_at'] - queued_at
+            with metrics_lock:
+                metrics['processed'] += 1
+                metrics['bytes_in'] += stats['bytes_in']
+                metrics['bytes_out'] += stats['bytes_out']
+                metrics['skipped_files'] += stats['skipped_files']
+                metrics['queue_latency_total'] += latency
+                metrics['queue_latency_max'] = max(metrics['queue_latency_max'], latency)
+                metrics['processing_time_total'] += stats['finished_at'] - stats['started_at']
+            print(f"Cleaned {zip_file_path} in {stats['finished_at'] - stats['started_at']:.2f}s")
+        return callback
+
+    def write_status():
+        now = time.time()
+        with metrics_lock:
+            uptime = now - metrics['started_at']
+            done = metrics['processed'] + metrics['failed']
+            status = {
+                'updated_at': now,
+                'uptime_seconds': uptime,
+                'workers': workers,
+                'queued': metrics['submitted'] - done,
+                'processed': metrics['processed'],
+                'failed': metrics['failed'],
+                'bytes_in': metrics['bytes_in'],
+                'bytes_out': metrics['bytes_out'],
+                'skipped_text_files': metrics['skipped_files'],
+                'archives_per_minute': metrics['processed'] / uptime * 60 if uptime else 0.0,
+                'input_mb_per_second': metrics['bytes_in'] / uptime / (1024 * 1024) if uptime else 0.0,
+                'average_queue_latency_seconds':
+                    metrics['queue_latency_total'] / metrics['processed'] if metrics['processed'] else None,
+                'max_queue_latency_seconds': metrics['queue_latency_max'],
+                'average_processing_seconds':
+                    metrics['processing_time_total'] / metrics['processed'] if metrics['processed'] else None,
+                'last_error': metrics['last_error'],
+            }
+        temp_path = status_file + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            json.dump(status, file, indent=2)
+        os.replace(temp_path, status_file)
+
+    def find_settled_archives(now):
+        try:
+            names = os.listdir(watch_dir)
+        except OSError as e:
+            print(f"Error listing {watch_dir}: {e}")
+            return []
+
+        settled = []
+        present = set()
+        for name in names:
+            if name.startswith('.') or not name.lower().endswith('.zip'):
+                continue
+            zip_file_path = os.path.join(watch_dir, name)
+            try:
+                stat = os.stat(zip_file_path)
+            except OSError:
+                continue
+            present.add(zip_file_path)
+            key = (zip_file_path, stat.st_size, stat.st_mtime_ns)
+            if key in submitted:
+                continue
+            candidate = candidates.get(zip_file_path)
+            if candidate is None or candidate[:2] != key[1:]:
+                # New file, or still being written
+                candidates[zip_file_path] = (stat.st_size, stat.st_mtime_ns, now)
+            elif now - candidate[2] >= settle_time:
+                del candidates[zip_file_path]
+                submitted.add(key)
+                settled.append((zip_file_path, stat.st_mtime))
+
+        # Forget files that were removed before they settled
+        for zip_file_path in set(candidates) - present:
+            del candidates[zip_file_path]
+        return settled
+
+    def request_stop(signum, frame):
+        stop.set()
+
+    def start_pool():
+        return concurrent.futures.ProcessPoolExecutor(workers, initializer=init_daemon_worker)
+
+    signal.signal(signal.SIGINT, request_stop)
+    signal.signal(signal.SIGTERM, request_stop)
+    pool = start_pool()
+    print(f"Watching {watch_dir} with {workers} workers (Ctrl+C to stop)...")
+
+    try:
+        last_status = 0.0
+        while not stop.is_set():
+            now = time.time()
+            for zip_file_path, mtime in find_settled_archives(now):
+                name = os.path.splitext(os.path.basename(zip_file_path))[0]
+                output_zip_path = os.path.join(output_dir, name + '_cleaned.zip')
+                # Cleaned by an earlier run of the daemon
+                if os.path.exists(output_zip_path) and os.path.getmtime(output_zip_path) >= mtime:
+                    continue
+                with metrics_lock:
+                    metrics['submitted'] += 1
+                try:
+                    future = pool.submit(clean_archive_job, zip_file_path, output_zip_path)
+                except concurrent.futures.process.BrokenProcessPool:
+                    # A worker died (for example killed by the OOM killer); the
+                    # jobs it took down have already been counted as failed
+                    print("A worker process died, restarting the worker pool")
+                    pool.shutdown(wait=False)
+                    pool = start_pool()
+                    future = pool.submit(clean_archive_job, zip_file_path, output_zip_path)
+                future.add_done_callback(on_finished(zip_file_path, time.time()))
+
+            if now - last_status >= status_interval:
+                write_status()
+                last_status = now
+            stop.wait(poll_interval)
+
+        print("\nStopping, waiting for queued archives to finish...")
+    finally:
+        # Returns once every queued archive is done, or as soon as the
+        # executor notices its workers were killed
+        pool.shutdown(wait=True)
+        remove_partial_outputs(output_dir)
+
+    write_status()
+
+def hash_file(file_path, chunk_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for chunk in iter(lambda: file.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def update_attachment_links_in_file(file_path, dedup_mapping):
+    # Point src/href links at the canonical copy of a deduplicated attachment
+    with open(file_path, 'r', encoding='utf-8') as file:
+        content = file.read()
+
+    file_dir = os.path.dirname(file_path)
+
+    def replace_link(match):
+        prefix, link = match.groups()
+        if '://' in link or link.startswith(('#', '/', 'mailto:')):
+            return match.group(0)
+        target, anchor, fragment = link.partition('#')
+        resolved = os.path.normpath(os.path.join(file_dir, unquote(target)))
+        if resolved not in dedup_mapping:
+            return match.group(0)
+        new_target = os.path.relpath(dedup_mapping[resolved], file_dir).replace(os.sep, '/')
+        # Keep the link encoded the same way Notion wrote it
+        if target != unquote(target):
+            new_target = quote(new_target)
+        return f"{prefix}{new_target}{anchor}{fragment}"
+
+    new_content = LINK_PATTERN.sub(replace_link, content)
+
+    if new_content != content:
+        with open(file_path, 'w', encoding='utf-8') as file:
+            file.write(new_content)
+
+def mentions_link_target(content, target):
+    # Whether target appears in content as a whole link target, optionally
+    # written with a leading "./"
+    start = content.find(target)
+    while start != -1:
+        before = start - 2 if start >= 2 and content.startswith('./', start - 2) else start
+        end = start + len(target)
+        if ((before == 0 or content[before - 1] in LINK_BOUNDARY_BEFORE)
+                and (end == len(content) or content[end] in LINK_BOUNDARY_AFTER)):
+            return True
+        start = content.find(target, start + 1)
+    return False
+
+def find_remaining_references(root_directory, duplicates):
+    # Return the duplicates that some text file still links to, in any form,
+    # after the links LINK_PATTERN understands have been rewritten
+    duplicates_by_name = {}
+    for duplicate in duplicates:
+        duplicates_by_name.setdefault(os.path.basename(duplicate), []).append(duplicate)
+
+    referenced = set()
+    for root, _, files in os.walk(root_directory):
+        for name in files:
+            _, ext = os.path.splitext(name)
+            if ext.lower() not in TEXT_EXTENSIONS:
+                continue
+            with open(os.path.join(root, name), 'r', encoding='utf-8') as file:
+                content = unquote(file.read())
+            for duplicate_name, paths in duplicates_by_name.items():
+                if duplicate_name not in content:
+                    continue
+                for duplicate in paths:
+                    target = os.path.relpath(duplicate, root).replace(os.sep, '/')
+                    if mentions_link_target(content, target):
+                        referenced.add(duplicate)
+    return referenced
+
+def deduplicate_attachments(root_directory):
+    # Keep one copy of each unique attachment and rewrite links to point at it.
+    # Returns the number of bytes saved.
+    files_by_size = {}
+
+    # Step 1: Group attachments by size so only possible duplicates get hashed
+    for root, _, files in os.walk(root_directory):
+        for name in files:
+            _, ext = os.path.splitext(name)
+            if ext.lower() in TEXT_EXTENSIONS:
+                continue
+            file_path = os.path.join(root, name)
+            files_by_size.setdefault(os.path.getsize(file_path), []).append(file_path)
+
+    # Step 2: Hash candidates and map every duplicate to a canonical copy
+    dedup_mapping = {}  # Map duplicate paths to their canonical path
+    bytes_saved = 0
+
+    for size, paths in files_by_size.items():
+        if len(paths) < 2:
+            continue
+        paths_by_hash = {}
+        for file_path in paths:
+            paths_by_hash.setdefault(hash_file(file_path), []).append(file_path)
+        for same_paths in paths_by_hash.values():
+            # The shallowest path is kept so links stay short
+            canonical, *duplicates = sorted(same_paths, key=lambda p: (path_depth(p), p))
+            for duplicate in duplicates:
+                dedup_mapping[os.path.normpath(duplicate)] = canonical
+
+    if not dedup_mapping:
+        return 0
+
+    # Step 3: Update links before removing the duplicates
+    for root, _, files in os.walk(root_directory):
+        for name in files:
+            _, ext = os.path.splitext(name)
+            if ext.lower() in TEXT_EXTENSIONS:
+                update_attachment_links_in_file(os.path.join(root, name), dedup_mapping)
+
+    # Step 4: Remove a duplicate only once nothing links to it any more
+    still_referenced = find_remaining_references(root_directory, dedup_mapping)
+    for duplicate in dedup_mapping:
+        if duplicate in still_referenced:
+            print(f"Keeping duplicate {os.path.relpath(duplicate, root_directory)}: "
+                  "a link to it could not be rewritten")
+            continue
+        try:
+            size = os.path.getsize(duplicate)
+            os.remove(duplicate)
+            bytes_saved += size
+        except OSError as e:
+            print(f"Error removing duplicate {duplicate}: {e}")
+
+    return bytes_saved
+
+def format_size(num_bytes):
+    size = float(num_bytes)
+    for unit in ('B', 'KB', 'MB'):
+        if size < 1024:
+            return f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+def print_skipped(stats):
+    print(f"Skipped {stats['skipped_files']} text files ({format_size(stats['skipped_bytes'])}) "
+          "with no Notion references")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Remove Notion IDs from an exported zip file and update links.")
+    parser.add_argument('zip_file', nargs='?',
+                        help="path to the Notion-exported zip file (prompted for if omitted)")
+    parser.add_argument('--dedupe', action='store_true',
+                        help="keep a single copy of identical attachments and point links at it")
+    parser.add_argument('--pipeline', action='store_true',
+                        help="stream members through overlapping decompress, rewrite and compress stages "
+                             "instead of extracting to a temporary directory")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="number of rewrite workers in pipeline mode, or worker processes "
+                             "in watch mode (default: CPU count)")
+    parser.add_argument('--buffer-mb', type=int, default=64,
+                        help="maximum megabytes of members held between pipeline stages (default: 64)")
+    parser.add_argument('--output-dir',
+                        help="write the cleaned tree to this directory instead of a _cleaned.zip")
+    parser.add_argument('--cache-dir',
+                        help="earlier output to hardlink unchanged files from in --output-dir mode "
+                             "(default: the previous contents of --output-dir)")
+    parser.add_argument('--watch', metavar='DIR',
+                        help="run as a daemon, cleaning every .zip that appears in DIR")
+    parser.add_argument('--watch-output', metavar='DIR',
+                        help="directory that cleaned zips are written to in watch mode")
+    parser.add_argument('--poll-interval', type=float, default=2.0,
+                        help="seconds between scans of the watched directory (default: 2)")
+    parser.add_argument('--settle-time', type=float, default=5.0,
+                        help="seconds a file's size must stay unchanged before it is cleaned (default: 5)")
+    parser.add_argument('--status-file',
+                        help="JSON file with throughput and queue latency (default: status.json "
+                             "in the --watch-output directory)")
+    parser.add_argument('--status-interval', type=float, default=10.0,
+                        help="seconds between status file updates (default: 10)")
+    args = parser.parse_args()
+    if args.workers is not None and args.workers < 1:
+        parser.error("--workers must be at least 1")
+    if args.buffer_mb < 1:
+        parser.error("--buffer-mb must be at least 1")
+    if args.watch:
+        if args.zip_file or args.pipeline or args.dedupe or args.output_dir:
+            parser.error("--watch cannot be combined with a zip file, --pipeline, --dedupe or --output-dir")
+        if not args.watch_output:
+            parser.error("--watch requires --watch-output")
+        if os.path.abspath(args.watch) == os.path.abspath(args.watch_output):
+            parser.error("--watch-output must be a different directory from --watch")
+    elif args.watch_output:
+        parser.error("--watch-output requires --watch")
+    if args.pipeline and args.dedupe:
+        parser.error("--dedupe cannot be combined with --pipeline")
+    if args.output_dir and (args.pipeline or args.dedupe):
+        parser.error("--output-dir cannot be combined with --pipeline or --dedupe")
+    if args.cache_dir and not args.output_dir:
+        parser.error("--cache-dir requires --output-dir")
+    return args
 
 def main():
+    args = parse_args()
+
+    if args.watch:
+        watch_directory(
+            os.path.abspath(os.path.expanduser(args.watch)),
+            os.path.abspath(os.path.expanduser(args.watch_output)),
+            workers=args.workers,
+            poll_interval=args.poll_interval,
+            settle_time=args.settle_time,
+            status_file=args.status_file,
+            status_interval=args.status_interval,
+        )
+        return
+
+    # Only pause for the user when running as an interactive session
+    interactive = args.zip_file is None
+
+    def exit_with_error(message):
+        print(message)
+        if interactive:
+            input("\nPress Enter to exit...")
+        sys.exit(1)
+
     print("=== Notion Export Cleanup Tool ===\n")
-    zip_file_path = input("Please enter the full path to your Notion-exported zip file:\n> ").strip().strip('"').strip("'")
+    if interactive:
+        zip_file_path = input("Please enter the full path to your Notion-exported zip file:\n> ").strip().strip('"').strip("'")
+    else:
+        zip_file_path = args.zip_file
 
     # Convert to absolute path
     zip_file_path = os.path.abspath(os.path.expanduser(zip_file_path))
@@ -95,13 +978,51 @@ def main():
     print(f"\nProcessing file: {zip_file_path}")
 
     if not os.path.isfile(zip_file_path):
-        print("\nError: The file does not exist. Please check the path and try again.")
-        input("\nPress Enter to exit...")
-        sys.exit(1)
+        exit_with_error("\nError: The file does not exist. Please check the path and try again.")
     elif not zip_file_path.lower().endswith('.zip'):
-        print("\nError: The provided file does not have a .zip extension.")
-        input("\nPress Enter to exit...")
-        sys.exit(1)
+        exit_with_error("\nError: The provided file does not have a .zip extension.")
+
+    if args.output_dir:
+        output_dir = os.path.abspath(os.path.expanduser(args.output_dir))
+        cache_dir = os.path.abspath(os.path.expanduser(args.cache_dir)) if args.cache_dir else None
+        print("\nWriting cleaned files...")
+        try:
+            stats = clean_zip_to_directory(zip_file_path, output_dir, cache_dir)
+        except zipfile.BadZipFile:
+            exit_with_error("\nError: The zip file is corrupted or not a zip file.")
+        except Exception as e:
+            exit_with_error(f"\nAn error occurred while cleaning the zip file: {e}")
+
+        print(f"Wrote {stats['written']} files, reused {stats['linked']} by hardlink "
+              f"and {stats['copied']} by copy")
+        print_skipped(stats)
+
+        print(f"\nCleaned files written to:\n{output_dir}")
+        if interactive:
+            input("\nProcessing complete. Press Enter to exit...")
+        return
+
+    output_zip_path = os.path.splitext(zip_file_path)[0] + '_cleaned.zip'
+
+    if args.pipeline:
+        print("\nCleaning zip file in pipeline mode...")
+        try:
+            stats = clean_zip_pipelined(zip_file_path, output_zip_path, args.workers,
+                                        args.buffer_mb * 1024 * 1024)
+        except zipfile.BadZipFile:
+            exit_with_error("\nError: The zip file is corrupted or not a zip file.")
+        except Exception as e:
+            exit_with_error(f"\nAn error occurred while cleaning the zip file: {e}")
+
+        print(f"Finished in {stats['wall_time']:.2f}s")
+        for stage, utilization in stats['utilization'].items():
+            print(f"  {stage:<8} {utilization:6.1%} CPU busy")
+        print_skipped(stats)
+
+        print(f"\nCleaned zip file created at:\n{output_zip_path}")
+        if interactive:
+            input("\nProcessing complete. Press Enter to exit...")
+        return
 
     # Create a temporary directory to work in
     with tempfile.TemporaryDirectory() as temp_dir:
@@ -111,24 +1032,26 @@ def main():
             with zipfile.ZipFile(zip_file_path, 'r') as zip_ref:
                 zip_ref.extractall(temp_dir)
         except zipfile.BadZipFile:
-            print("\nError: The zip file is corrupted or not a zip file.")
-            input("\nPress Enter to exit...")
-            sys.exit(1)
+            exit_with_error("\nError: The zip file is corrupted or not a zip file.")
         except Exception as e:
-            print(f"\nAn error occurred while extracting the zip file: {e}")
-            input("\nPress Enter to exit...")
-            sys.exit(1)
+            exit_with_error(f"\nAn error occurred while extracting the zip file: {e}")
 
         print("Processing files...")
         # Process the extracted directory
-        process_directory(temp_dir)
+        stats = process_directory(temp_dir)
+        print_skipped(stats)
+
+        if args.dedupe:
+            print("Deduplicating attachments...")
+            bytes_saved = deduplicate_attachments(temp_dir)
+            print(f"Deduplication saved {format_size(bytes_saved)}")
 
         # Create a new zip file without Notion IDs
-        output_zip_path = os.path.splitext(zip_file_path)[0] + '_cleaned.zip'
         shutil.make_archive(os.path.splitext(output_zip_path)[0], 'zip', temp_dir)
 
         print(f"\nCleaned zip file created at:\n{output_zip_path}")
-        input("\nProcessing complete. Press Enter to exit...")
+        if interactive:
+            input("\nProcessing complete. Press Enter to exit...")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,130 @@
+import os
+import sys
+import random
+import argparse
+import posixpath
+import zipfile
+from urllib.parse import quote
+
+# Words used to build page and attachment titles
+WORDS = [
+    'Project', 'Notes', 'Meeting', 'Roadmap', 'Ideas', 'Weekly', 'Review', 'Design',
+    'Research', 'Plan', 'Draft', 'Team', 'Budget', 'Launch', 'Goals', 'Tasks',
+]
+
+# Characters that Notion percent-encodes in links
+SPECIAL_WORDS = ['Q&A', 'Café', 'R&D', '50%', 'Über', 'C++', 'Q1/Q2', 'Ideas #2']
+
+PAGE_TEMPLATE = """<html><head><meta charset="utf-8"><title>{title}</title></head>
+<body><article><h1>{title}</h1>
+{body}
+</article></body></html>
+"""
+
+def notion_id(rng):
+    return '%032x' % rng.getrandbits(128)
+
+def make_title(rng, encoded_ratio):
+    words = rng.sample(WORDS, rng.randint(1, 3))
+    if rng.random() < encoded_ratio:
+        words.insert(rng.randrange(len(words) + 1), rng.choice(SPECIAL_WORDS))
+    # '/' cannot appear in a file name; Notion replaces it
+    return ' '.join(words).replace('/', ' ')
+
+def build_pages(rng, pages, depth, encoded_ratio):
+    # Lay pages out as a tree no deeper than depth. Each page is a dict with
+    # its HTML path and the folder holding its children and attachments.
+    tree = []
+    parents = [None]  # Pages that may still have children; None is the root
+    for index in range(pages):
+        parent = rng.choice(parents)
+        title = make_title(rng, encoded_ratio)
+        name = f"{title} {notion_id(rng)}"
+        folder = posixpath.join(parent['folder'], name) if parent else name
+        page = {
+            'index': index,
+            'title': title,
+            'path': folder + '.html',
+            'folder': folder,
+            'level': parent['level'] + 1 if parent else 0,
+            'children': [],
+            'attachments': [],
+        }
+        if parent:
+            parent['children'].append(page)
+        tree.append(page)
+        if page['level'] + 1 < depth:
+            parents.append(page)
+    return tree
+
+def relative_link(from_page, to_path):
+    # Notion links are relative to the linking page and percent-encoded
+    return quote(posixpath.relpath(to_path, posixpath.dirname(from_page['path'])))
+
+def generate_export(zip_path, pages=100, depth=4, links_per_page=5, attachments_per_page=1,
+                    attachment_size=64 * 1024, encoded_ratio=0.2, seed=0):
+    # Write a Notion-style export to zip_path and return the number of files in it
+    rng = random.Random(seed)
+    tree = build_pages(rng, pages, depth, encoded_ratio)
+    file_count = 0
+
+    with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zip_ref:
+        for page in tree:
+            for _ in range(attachments_per_page):
+                extension = rng.choice(['.png', '.jpg', '.pdf'])
+                name = f"{make_title(rng, encoded_ratio)} {notion_id(rng)}{extension}"
+                size = max(1, int(rng.expovariate(1 / attachment_size)))
+                path = posixpath.join(page['folder'], name)
+                page['attachments'].append(path)
+                zip_ref.writestr(path, rng.randbytes(size), compress_type=zipfile.ZIP_STORED)
+                file_count += 1
+
+        for page in tree:
+            lines = []
+            for child in page['children']:
+                lines.append(f'<a href="{relative_link(page, child["path"])}">{child["title"]}</a>')
+            for attachment in page['attachments']:
+                lines.append(f'<img src="{relative_link(page, attachment)}"/>')
+            for other in rng.sample(tree, min(links_per_page, len(tree))):
+                lines.append(f'<p>See <a href="{relative_link(page, other["path"])}">{other["title"]}</a></p>')
+            zip_ref.writestr(page['path'], PAGE_TEMPLATE.format(title=page['title'], body='\n'.join(lines)))
+            file_count += 1
+
+    return file_count
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Generate a synthetic Notion-style zip export.")
+    parser.add_argument('zip_file', help="path of the zip file to create")
+    parser.add_argument('--pages', type=int, default=100, help="number of pages (default: 100)")
+    parser.add_argument('--depth', type=int, default=4, help="maximum page nesting depth (default: 4)")
+    parser.add_argument('--links-per-page', type=int, default=5,
+                        help="links from each page to other pages (default: 5)")
+    parser.add_argument('--attachments-per-page', type=int, default=1,
+                        help="attachments stored with each page (default: 1)")
+    parser.add_argument('--attachment-size', type=int, default=64 * 1024,
+                        help="mean attachment size in bytes (default: 65536)")
+    parser.add_argument('--encoded-ratio', type=float, default=0.2,
+                        help="fraction of names with characters that need percent-encoding (default: 0.2)")
+    parser.add_argument('--seed', type=int, default=0, help="random seed (default: 0)")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    if args.depth < 1:
+        sys.exit("Error: --depth must be at least 1")
+
+    file_count = generate_export(
+        args.zip_file,
+        pages=args.pages,
+        depth=args.depth,
+        links_per_page=args.links_per_page,
+        attachments_per_page=args.attachments_per_page,
+        attachment_size=args.attachment_size,
+        encoded_ratio=args.encoded_ratio,
+        seed=args.seed,
+    )
+    size = os.path.getsize(args.zip_file)
+    print(f"Wrote {file_count} files ({size / (1024 * 1024):.1f} MB) to {args.zip_file}")
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,8 @@
 import pygame
 import random
+import time
+
+from tetris_scores import ScoreStore
 
 # Initialize Pygame
 pygame.init()
@@ -128,6 +131,19 @@ SHAPES = [
       '.....']]
 ]
 
+def get_bottom_profile(shape_format):
+    # Lowest cell of each column of a rotation, as (x offset, y offset) pairs
+    # using the same offsets as convert_shape_format
+    bottoms = {}
+    for i, line in enumerate(shape_format):
+        for j, column in enumerate(line):
+            if column == '0':
+                bottoms[j - 2] = i - 4
+    return sorted(bottoms.items())
+
+# Bottom profiles of every rotation of every shape, computed once
+SHAPE_BOTTOMS = [[get_bottom_profile(shape_format) for shape_format in shape] for shape in SHAPES]
+
 class Piece:
     def __init__(self, x, y, shape):
         self.x = x
@@ -166,6 +182,38 @@ def valid_space(piece, grid):
                 return False
     return True
 
+def get_column_heights(locked_positions):
+    # Height of the highest locked block in each column (0 for an empty column)
+    heights = [0] * COLS
+    for (x, y) in locked_positions:
+        if y > -1:
+            heights[x] = max(heights[x], ROWS - y)
+    return heights
+
+def update_column_heights(heights, positions):
+    # Raise the column heights for a piece that just locked
+    for (x, y) in positions:
+        if y > -1:
+            heights[x] = max(heights[x], ROWS - y)
+
+def get_landing_y(piece, heights, grid):
+    # Find how far the piece can fall from the column heights and the piece's
+    # bottom profile, so only the piece's columns are looked at
+    profile = SHAPE_BOTTOMS[SHAPES.index(piece.shape)][piece.rotation % len(piece.shape)]
+    if all(0 <= piece.x + dx < COLS for dx, _ in profile):
+        drop = min((ROWS - heights[piece.x + dx]) - 1 - (piece.y + dy) for dx, dy in profile)
+        if drop >= 0:
+            return piece.y + drop
+
+    # The piece is under an overhang or partly off the side above the board,
+    # so the heights can't tell where it lands; step down through the grid
+    start_y = piece.y
+    while valid_space(piece, grid):
+        piece.y += 1
+    landing_y = piece.y - 1
+    piece.y = start_y
+    return landing_y
+
 def check_lost(positions):
     for pos in positions:
         x, y = pos
@@ -222,6 +270,13 @@ def draw_next_shape(piece, surface):
                 pygame.draw.rect(surface, piece.color, (sx + j * SQUARE_SIZE, sy + i * SQUARE_SIZE, SQUARE_SIZE, SQUARE_SIZE), 0)
     surface.blit(label, (sx + 10, sy - 30))
 
+def draw_ghost_piece(surface, piece, landing_y):
+    # Outline where the current piece will land
+    for x, y in convert_shape_format(piece):
+        y += landing_y - piece.y
+        if y > -1:
+            pygame.draw.rect(surface, piece.color, (x * SQUARE_SIZE, y * SQUARE_SIZE, SQUARE_SIZE, SQUARE_SIZE), 2)
+
 def draw_window(surface, grid, score=0):
     surface.fill(BLACK)
     font = pygame.font.SysFont('comicsans', 60)
@@ -236,8 +291,14 @@ def draw_window(surface, grid, score=0):
     pygame.draw.rect(surface, (255, 0, 0), (0, 0, WIDTH, HEIGHT), 5)
 
 def main():
+    # Seed the piece sequence so each recorded game can be replayed
+    seed = random.randrange(2 ** 32)
+    random.seed(seed)
+    started_at = time.time()
+
     locked_positions = {}
     grid = create_grid(locked_positions)
+    column_heights = get_column_heights(locked_positions)
 
     change_piece = False
     run = True
@@ -247,6 +308,7 @@ def main():
     fall_time = 0
     level_time = 0
     score = 0
+    lines = 0
 
     while run:
         grid = create_grid(locked_positions)
@@ -265,6 +327,8 @@ def main():
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 run = False
+                # quit() exits right away, so save the unfinished game first
+                score_store.record('4o', started_at, time.time() - started_at, score, lines, seed)
                 pygame.display.quit()
                 quit()
 
@@ -285,8 +349,13 @@ def main():
                     current_piece.rotation = current_piece.rotation + 1 % len(current_piece.shape)
                     if not valid_space(current_piece, grid):
                         current_piece.rotation = current_piece.rotation - 1 % len(current_piece.shape)
+                elif event.key == pygame.K_SPACE:
+                    current_piece.y = get_landing_y(current_piece, column_heights, grid)
+                    change_piece = True
 
         shape_pos = convert_shape_format(current_piece)
+        # Work out the ghost position before the piece is drawn into the grid
+        ghost_y = get_landing_y(current_piece, column_heights, grid)
 
         for i in range(len(shape_pos)):
             x, y = shape_pos[i]
@@ -297,12 +366,20 @@ def main():
             for pos in shape_pos:
                 p = (pos[0], pos[1])
                 locked_positions[p] = current_piece.color
+            update_column_heights(column_heights, shape_pos)
+            ghost_y = None
             current_piece = next_piece
             next_piece = get_shape()
             change_piece = False
-            score += clear_rows(grid, locked_positions) * 10
+            cleared = clear_rows(grid, locked_positions)
+            if cleared:
+                column_heights = get_column_heights(locked_positions)
+            lines += cleared
+            score += cleared * 10
 
         draw_window(WIN, grid, score)
+        if ghost_y is not None:
+            draw_ghost_piece(WIN, current_piece, ghost_y)
         draw_next_shape(next_piece, WIN)
         pygame.display.update()
 
@@ -312,13 +389,23 @@ def main():
             pygame.time.delay(1500)
             run = False
 
-    pygame.display.quit()
+    score_store.record('4o', started_at, time.time() - started_at, score, lines, seed)
+
+def draw_top_scores(surface, top_scores):
+    font = pygame.font.SysFont('comicsans', 30)
+    sy = HEIGHT // 2 + 60
+    label = font.render('High Scores', 1, WHITE)
+    surface.blit(label, (WIDTH // 2 - (label.get_width() // 2), sy))
+    for i, (score, lines, day) in enumerate(top_scores):
+        label = font.render(f'{i + 1}. {score} ({lines} lines)', 1, WHITE)
+        surface.blit(label, (WIDTH // 2 - (label.get_width() // 2), sy + (i + 1) * 35))
 
 def main_menu():
     run = True
     while run:
         WIN.fill(BLACK)
         draw_text_middle('Press Any Key To Play', 60, WHITE, WIN)
+        draw_top_scores(WIN, score_store.top_scores())
         pygame.display.update()
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
@@ -328,4 +415,9 @@ def main_menu():
     pygame.quit()
 
 if __name__ == "__main__":
-    main_menu()
\ No newline at end of file
+    score_store = ScoreStore()
+    try:
+        main_menu()
+    finally:
+        # Flush any queued sessions before exiting
+        score_store.close()
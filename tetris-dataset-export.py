@@ -0,0 +1,242 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import importlib.util
+
+import numpy as np
+
+# A dataset is a directory with one raw little-endian file per column and a
+# meta.json describing the columns and how many rows have been committed.
+# Readers map only the committed rows, so they can open it while it grows.
+META_NAME = 'meta.json'
+
+ROWS = 20
+
+# Boards are stored as one bitmask per row; bit x is set when column x is filled
+COLUMNS = [
+    ('game', '<u4', ()),
+    ('step', '<u4', ()),
+    ('board', '<u2', (ROWS,)),
+    ('piece', 'u1', ()),
+    ('rotation', 'u1', ()),
+    ('x', 'i1', ()),
+    ('y', 'i1', ()),
+    ('action', 'u1', ()),
+    ('reward', '<i2', ()),
+    ('done', 'u1', ()),
+]
+
+ACTIONS = ['none', 'left', 'right', 'down', 'rotate']
+NONE, LEFT, RIGHT, DOWN, ROTATE = range(len(ACTIONS))
+
+def load_game(name='tetris-o1.py'):
+    # The game scripts have dashes in their names, so load them by path.
+    # Importing one does not open a window; only running it as a script does.
+    os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), name)
+    spec = importlib.util.spec_from_file_location('tetris_game', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+class DatasetWriter:
+    def __init__(self, path, chunk_rows=1 << 20):
+        self.path = path
+        self.chunk_rows = chunk_rows
+        self.rows = 0
+        self.capacity = 0
+        self.columns = {}
+        os.makedirs(path, exist_ok=True)
+        for name, dtype, shape in COLUMNS:
+            # Start each column from an empty file
+            open(self.column_path(name), 'wb').close()
+        self.grow()
+        self.commit()
+
+    def column_path(self, name):
+        return os.path.join(self.path, name + '.bin')
+
+    def grow(self):
+        # Extend every column file by one chunk and map the larger file
+        self.flush()
+        self.capacity += self.chunk_rows
+        for name, dtype, shape in COLUMNS:
+            itemsize = np.dtype(dtype).itemsize * int(np.prod(shape, dtype=np.int64))
+            with open(self.column_path(name), 'r+b') as file:
+                file.truncate(self.capacity * itemsize)
+            self.columns[name] = np.memmap(self.column_path(name), dtype=dtype, mode='r+',
+                                           shape=(self.capacity,) + shape)
+
+    def append(self, game, step, board, piece, rotation, x, y, action, reward, done):
+        if self.rows == self.capacity:
+            self.grow()
+        row = self.rows
+        columns = self.columns
+        columns['game'][row] = game
+        columns['step'][row] = step
+        columns['board'][row] = board
+        columns['piece'][row] = piece
+        columns['rotation'][row] = rotation
+        columns['x'][row] = x
+        columns['y'][row] = y
+        columns['action'][row] = action
+        columns['reward'][row] = reward
+        columns['done'][row] = done
+        self.rows += 1
+
+    def flush(self):
+        for column in self.columns.values():
+            column.flush()
+
+    def commit(self):
+        # Flush the data before publishing the new row count to readers
+        self.flush()
+        meta = {
+            'rows': self.rows,
+            'columns': [{'name': name, 'dtype': dtype, 'shape': list(shape)}
+                        for name, dtype, shape in COLUMNS],
+        }
+        meta_path = os.path.join(self.path, META_NAME)
+        with open(meta_path + '.tmp', 'w', encoding='utf-8') as file:
+            json.dump(meta, file)
+        os.replace(meta_path + '.tmp', meta_path)
+
+    def close(self):
+        self.commit()
+        self.columns = {}
+
+def open_dataset(path):
+    # Map the committed rows of every column read-only, without copying
+    with open(os.path.join(path, META_NAME), 'r', encoding='utf-8') as file:
+        meta = json.load(file)
+    rows = meta['rows']
+    dataset = {}
+    for column in meta['columns']:
+        shape = (rows,) + tuple(column['shape'])
+        if rows == 0:
+            dataset[column['name']] = np.empty(shape, dtype=column['dtype'])
+        else:
+            dataset[column['name']] = np.memmap(os.path.join(path, column['name'] + '.bin'),
+                                                dtype=column['dtype'], mode='r', shape=shape)
+    return dataset
+
+def pack_board(locked_positions):
+    board = [0] * ROWS
+    for (x, y) in locked_positions:
+        if 0 <= y < ROWS:
+            board[y] |= 1 << x
+    return board
+
+def get_free_cells(grid):
+    # The cells valid_space accepts, built once per lock instead of every check
+    return {(x, y) for y, row in enumerate(grid) for x, color in enumerate(row) if color == (0, 0, 0)}
+
+def fits(game, piece, free_cells):
+    # Same rule as the game's valid_space, against the cached free cells
+    for pos in game.convert_shape_format(piece):
+        if pos not in free_cells and pos[1] > -1:
+            return False
+    return True
+
+def simulate(game, writer, total_rows, commit_every, rng):
+    # Play random moves headless, following the same steps as the game's main loop
+    game_id = 0
+    while writer.rows < total_rows:
+        locked_positions = {}
+        current_piece = game.get_shape()
+        step = 0
+        done = False
+        # The grid, free cells and packed board only change when a piece locks
+        grid = game.create_grid(locked_positions)
+        free_cells = get_free_cells(grid)
+        board = pack_board(locked_positions)
+
+        while not done and writer.rows < total_rows:
+            piece = game.shapes.index(current_piece.shape)
+            rotation = current_piece.rotation % len(current_piece.shape)
+            x, y = current_piece.x, current_piece.y
+
+            action = rng.randrange(len(ACTIONS))
+            if action == LEFT:
+                current_piece.x -= 1
+                if not fits(game, current_piece, free_cells):
+                    current_piece.x += 1
+            elif action == RIGHT:
+                current_piece.x += 1
+                if not fits(game, current_piece, free_cells):
+                    current_piece.x -= 1
+            elif action == DOWN:
+                current_piece.y += 1
+                if not fits(game, current_piece, free_cells):
+                    current_piece.y -= 1
+            elif action == ROTATE:
+                current_piece.rotation += 1
+                if not fits(game, current_piece, free_cells):
+                    current_piece.rotation -= 1
+
+            # Gravity moves the piece one row per step
+            change_piece = False
+            current_piece.y += 1
+            if not fits(game, current_piece, free_cells) and current_piece.y > 0:
+                current_piece.y -= 1
+                change_piece = True
+
+            reward = 0
+            if change_piece:
+                shape_pos = game.convert_shape_format(current_piece)
+                for pos in shape_pos:
+                    if pos[1] > -1:
+                        grid[pos[1]][pos[0]] = current_piece.color
+                    locked_positions[pos] = current_piece.color
+                current_piece = game.get_shape()
+                reward = game.clear_rows(grid, locked_positions) * 10
+                done = game.check_lost(locked_positions)
+
+            writer.append(game_id, step, board, piece, rotation, x, y, action, reward, done)
+            if change_piece:
+                grid = game.create_grid(locked_positions)
+                free_cells = get_free_cells(grid)
+                board = pack_board(locked_positions)
+            step += 1
+            if writer.rows % commit_every == 0:
+                writer.commit()
+
+        game_id += 1
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Export simulated Tetris games as a memory-mapped columnar dataset.")
+    parser.add_argument('output_dir', help="directory to write the dataset to")
+    parser.add_argument('--rows', type=int, default=1000000, help="number of rows to write (default: 1000000)")
+    parser.add_argument('--chunk-rows', type=int, default=1 << 20,
+                        help="rows to grow the column files by at a time (default: 1048576)")
+    parser.add_argument('--commit-every', type=int, default=1 << 16,
+                        help="rows between publishing the row count to readers (default: 65536)")
+    parser.add_argument('--seed', type=int, default=None, help="random seed")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    if args.chunk_rows < 1 or args.commit_every < 1:
+        sys.exit("Error: --chunk-rows and --commit-every must be positive")
+
+    # The game draws pieces from the global random module
+    random.seed(args.seed)
+    rng = random.Random(args.seed)
+    game = load_game()
+
+    writer = DatasetWriter(args.output_dir, args.chunk_rows)
+    start = time.perf_counter()
+    try:
+        simulate(game, writer, args.rows, args.commit_every, rng)
+    finally:
+        writer.close()
+    elapsed = time.perf_counter() - start
+
+    print(f"Wrote {writer.rows} rows to {args.output_dir} in {elapsed:.1f}s "
+          f"({writer.rows / elapsed * 60:,.0f} rows/min)")
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,8 @@
 import pygame
 import random
+import time
 
-# Initialize Pygame
-pygame.init()
+from tetris_scores import ScoreStore
 
 # Screen dimensions
 s_width = 800
@@ -130,6 +130,19 @@ shape_colors = [
 ]
 # Index 0 - 6 represent shapes
 
+def get_bottom_profile(format_shape):
+    # Lowest cell of each column of a rotation, as (x offset, y offset) pairs
+    # using the same offsets as convert_shape_format
+    bottoms = {}
+    for i, line in enumerate(format_shape):
+        for j, column in enumerate(line):
+            if column == '0':
+                bottoms[j - 2] = i - 4
+    return sorted(bottoms.items())
+
+# Bottom profiles of every rotation of every shape, computed once
+shape_bottoms = [[get_bottom_profile(format_shape) for format_shape in shape] for shape in shapes]
+
 class Piece(object):
     def __init__(self, x, y, shape):
         self.x = x
@@ -170,6 +183,38 @@ def valid_space(shape, grid):
             return False
     return True
 
+def get_column_heights(locked_positions):
+    # Height of the highest locked block in each column (0 for an empty column)
+    heights = [0] * 10
+    for (x, y) in locked_positions:
+        if y > -1:
+            heights[x] = max(heights[x], 20 - y)
+    return heights
+
+def update_column_heights(heights, positions):
+    # Raise the column heights for a piece that just locked
+    for (x, y) in positions:
+        if y > -1:
+            heights[x] = max(heights[x], 20 - y)
+
+def get_landing_y(shape, heights, grid):
+    # Find how far the piece can fall from the column heights and the piece's
+    # bottom profile, so only the piece's columns are looked at
+    profile = shape_bottoms[shapes.index(shape.shape)][shape.rotation % len(shape.shape)]
+    if all(0 <= shape.x + dx < 10 for dx, _ in profile):
+        drop = min((20 - heights[shape.x + dx]) - 1 - (shape.y + dy) for dx, dy in profile)
+        if drop >= 0:
+            return shape.y + drop
+
+    # The piece is under an overhang or partly off the side above the board,
+    # so the heights can't tell where it lands; step down through the grid
+    start_y = shape.y
+    while valid_space(shape, grid):
+        shape.y += 1
+    landing_y = shape.y - 1
+    shape.y = start_y
+    return landing_y
+
 def check_lost(positions):
     for (_, y) in positions:
         if y < 1:
@@ -251,6 +296,18 @@ def draw_next_shape(shape, surface):
 
     surface.blit(label, (sx + 10, sy - 30))
 
+def draw_ghost_piece(surface, shape, landing_y):
+    # Outline where the current piece will land
+    for x, y in convert_shape_format(shape):
+        y += landing_y - shape.y
+        if y > -1:
+            pygame.draw.rect(
+                surface,
+                shape.color,
+                (top_left_x + x * block_size, top_left_y + y * block_size, block_size, block_size),
+                2,
+            )
+
 def draw_window(surface, grid, score=0):
     surface.fill((0, 0, 0))
 
@@ -293,8 +350,14 @@ def draw_window(surface, grid, score=0):
 def main():
     global grid
 
+    # Seed the piece sequence so each recorded game can be replayed
+    seed = random.randrange(2 ** 32)
+    random.seed(seed)
+    started_at = time.time()
+
     locked_positions = {}
     grid = create_grid(locked_positions)
+    column_heights = get_column_heights(locked_positions)
 
     change_piece = False
     run = True
@@ -306,6 +369,7 @@ def main():
     fall_speed = 0.27
     level_time = 0
     score = 0
+    lines = 0
 
     while run:
         grid = create_grid(locked_positions)
@@ -330,6 +394,8 @@ def main():
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 run = False
+                # quit() exits right away, so save the unfinished game first
+                score_store.record('o1', started_at, time.time() - started_at, score, lines, seed)
                 pygame.display.quit()
                 quit()
 
@@ -350,8 +416,14 @@ def main():
                     current_piece.rotation += 1
                     if not valid_space(current_piece, grid):
                         current_piece.rotation -= 1
+                elif event.key == pygame.K_SPACE:
+                    # Hard drop
+                    current_piece.y = get_landing_y(current_piece, column_heights, grid)
+                    change_piece = True
 
         shape_pos = convert_shape_format(current_piece)
+        # Work out the ghost position before the piece is drawn into the grid
+        ghost_y = get_landing_y(current_piece, column_heights, grid)
 
         # Add piece to grid
         for pos in shape_pos:
@@ -364,14 +436,22 @@ def main():
             for pos in shape_pos:
                 p = (pos[0], pos[1])
                 locked_positions[p] = current_piece.color
+            update_column_heights(column_heights, shape_pos)
+            ghost_y = None
             current_piece = next_piece
             next_piece = get_shape()
             change_piece = False
 
             # Clear rows and update score
-            score += clear_rows(grid, locked_positions) * 10
+            cleared = clear_rows(grid, locked_positions)
+            if cleared:
+                column_heights = get_column_heights(locked_positions)
+            lines += cleared
+            score += cleared * 10
 
         draw_window(win, grid, score)
+        if ghost_y is not None:
+            draw_ghost_piece(win, current_piece, ghost_y)
         draw_next_shape(next_piece, win)
         pygame.display.update()
 
@@ -379,15 +459,29 @@ def main():
         if check_lost(locked_positions):
             run = False
 
+    score_store.record('o1', started_at, time.time() - started_at, score, lines, seed)
+
     draw_text_middle(win, "You Lost", 40, (255, 255, 255))
     pygame.display.update()
     pygame.time.delay(2000)
 
+def draw_top_scores(surface, top_scores):
+    font = pygame.font.SysFont('comicsans', 30)
+    sx = top_left_x + play_width / 2
+    sy = top_left_y + play_height / 2 + 60
+
+    label = font.render('High Scores', True, (255, 255, 255))
+    surface.blit(label, (sx - label.get_width() / 2, sy))
+    for i, (score, lines, day) in enumerate(top_scores):
+        label = font.render(f'{i + 1}. {score}  ({lines} lines, {day})', True, (255, 255, 255))
+        surface.blit(label, (sx - label.get_width() / 2, sy + (i + 1) * 35))
+
 def main_menu():
     run = True
     while run:
         win.fill((0, 0, 0))
         draw_text_middle(win, 'Press Any Key To Play', 60, (255, 255, 255))
+        draw_top_scores(win, score_store.top_scores())
         pygame.display.update()
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
@@ -397,7 +491,15 @@ def main_menu():
                 main()
     pygame.quit()
 
-win = pygame.display.set_mode((s_width, s_height))
-pygame.display.set_caption('Tetris')
-
-main_menu()
\ No newline at end of file
+if __name__ == "__main__":
+    # Initialize Pygame only when run as a game, so the logic can be imported headless
+    pygame.init()
+    win = pygame.display.set_mode((s_width, s_height))
+    pygame.display.set_caption('Tetris')
+    score_store = ScoreStore()
+
+    try:
+        main_menu()
+    finally:
+        # Flush any queued sessions before exiting
+        score_store.close()
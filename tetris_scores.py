@@ -0,0 +1,111 @@
+import os
+import queue
+import sqlite3
+import datetime
+import threading
+
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tetris_scores.db')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY,
+    game TEXT NOT NULL,
+    started_at REAL NOT NULL,
+    day TEXT NOT NULL,
+    duration REAL NOT NULL,
+    score INTEGER NOT NULL,
+    lines INTEGER NOT NULL,
+    seed INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sessions_by_score ON sessions (score DESC);
+CREATE INDEX IF NOT EXISTS sessions_by_day ON sessions (day, score DESC);
+"""
+
+INSERT_SESSION = """
+INSERT INTO sessions (game, started_at, day, duration, score, lines, seed)
+VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
+
+class ScoreStore:
+    # Leaderboard and session log. record() only queues the session; a
+    # background thread writes queued sessions in batches, one transaction
+    # per batch, so the game loop never waits on the disk.
+
+    _stop = object()
+
+    def __init__(self, path=DEFAULT_DB_PATH, batch_size=100):
+        self.path = path
+        self.batch_size = batch_size
+        self.pending = queue.Queue()
+        # Bumped after every committed batch so cached queries know to refresh
+        self.version = 0
+        self.top_cache = {}
+
+        # The connection's context manager only commits, so close it ourselves
+        conn = sqlite3.connect(path)
+        try:
+            # WAL lets the menu read while the writer commits
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(SCHEMA)
+        finally:
+            conn.close()
+        self.reader = sqlite3.connect(path)
+
+        self.writer = threading.Thread(target=self.write_sessions, daemon=True)
+        self.writer.start()
+
+    def record(self, game, started_at, duration, score, lines, seed):
+        day = datetime.date.fromtimestamp(started_at).isoformat()
+        self.pending.put((game, started_at, day, duration, score, lines, seed))
+
+    def write_sessions(self):
+        conn = sqlite3.connect(self.path)
+        stopping = False
+        while not stopping:
+            item = self.pending.get()
+            if item is self._stop:
+                break
+            batch = [item]
+            # Take whatever else is already waiting, up to one batch
+            while len(batch) < self.batch_size:
+                try:
+                    item = self.pending.get_nowait()
+                except queue.Empty:
+                    break
+                if item is self._stop:
+                    stopping = True
+                    break
+                batch.append(item)
+            try:
+                with conn:
+                    conn.executemany(INSERT_SESSION, batch)
+                self.version += 1
+            except sqlite3.Error as e:
+                print(f"Error saving {len(batch)} game sessions: {e}")
+        conn.close()
+
+    def top_scores(self, limit=5):
+        # Cached until the writer commits something new, so this is cheap
+        # enough to call every frame
+        cached = self.top_cache.get(limit)
+        if cached and cached[0] == self.version:
+            return cached[1]
+        version = self.version
+        rows = self.reader.execute(
+            'SELECT score, lines, day FROM sessions ORDER BY score DESC LIMIT ?', (limit,)
+        ).fetchall()
+        self.top_cache[limit] = (version, rows)
+        return rows
+
+    def scores_for_day(self, day=None, limit=10):
+        day = day or datetime.date.today().isoformat()
+        return self.reader.execute(
+            'SELECT score, lines, duration FROM sessions WHERE day = ? ORDER BY score DESC LIMIT ?',
+            (day, limit),
+        ).fetchall()
+
+    def close(self):
+        # Write out everything still queued before returning
+        self.pending.put(self._stop)
+        self.writer.join()
+        self.reader.close()